@@ -1,59 +1,143 @@
+import io
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 from autogluon.timeseries import TimeSeriesDataFrame
 from statsmodels.tsa.seasonal import seasonal_decompose
-from sklearn.metrics import mean_absolute_percentage_error
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+from prepare_cache import cache_is_stale, write_cache
+
+FIGURE_DPI = 90  # Résolution des graphiques (moins de pixels à rasteriser)
 
 # Configuration de la page
 st.set_page_config(page_title="Dashboard de prévisions", layout="wide")
 
 # Charger les données
-@st.cache_data
-def load_data(file_path="clean_data.csv"):
-    # Charger les données
-    df = pd.read_csv(file_path)
-    
-    # Convertir les colonnes nécessaires
-    df['timestamp'] = pd.to_datetime(df['Date'], errors='coerce')
-    df['target'] = pd.to_numeric(df['Weekly_Sales'], errors='coerce')
-    df['item_id'] = df['Store'] if 'Store' in df.columns else 1
-
-    # Garder les colonnes nécessaires (avec covariates)
-    covariates = ['IsHoliday', 'Super_Bowl', 'Labor_Day', 'Thanksgiving', 'Christmas']
-    df = df[['item_id', 'timestamp', 'target'] + covariates].dropna()
-
-    # Trier les données
-    df = df.sort_values(by=['item_id', 'timestamp']).reset_index(drop=True)
-
-    # Éliminer les doublons dans `timestamp` par `item_id`
-    df = df.groupby(['item_id', 'timestamp'], as_index=False).mean()
-
-    # Rééchantillonnage (fréquence hebdomadaire)
-    freq = 'W'
-    regular_data = []
-    for item_id, group in df.groupby('item_id'):
-        group = group.set_index('timestamp').asfreq(freq, method='pad')  # Remplir les valeurs manquantes
-        group['item_id'] = item_id  # Ajouter l'ID
-        regular_data.append(group.reset_index())
-
-    # Combiner les données rééchantillonnées
-    df_regular = pd.concat(regular_data, ignore_index=True)
-
-    df_regular[covariates] = df_regular[covariates].apply(lambda x: x.astype(int).astype(object)) # Convertir en type catégorique
+@st.cache_resource(show_spinner=False)
+def load_data(file_path="clean_data.parquet", csv_path="clean_data.csv"):
+    # Charger les données préparées (regénérées par `prepare_cache.py` si le cache est périmé)
+    # Seule la cible est utilisée par le tableau de bord : les covariates restent dans le fichier
+    columns = ['item_id', 'timestamp', 'target']
+    if cache_is_stale(csv_path, file_path):
+        df_regular = write_cache(csv_path, file_path)[columns]
+    else:
+        df_regular = pd.read_parquet(file_path, columns=columns)
 
     ts_df = TimeSeriesDataFrame.from_data_frame(df_regular, id_column="item_id", timestamp_column="timestamp")
 
     return ts_df
 
-@st.cache_data
+@st.cache_resource(show_spinner=False)
 def load_predictions(file_path="all_predictions.csv"):
-    return pd.read_csv(file_path)
+    # Indexer les prévisions par magasin (une seule lecture, dates converties une fois)
+    df = pd.read_csv(file_path)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return {item_id: group.reset_index(drop=True) for item_id, group in df.groupby('item_id')}
 
 # Charger les données et les prévisions
 ts_df = load_data()
 all_predictions = load_predictions()
 
+# Décomposition saisonnière (mise en cache par magasin)
+@st.cache_data(ttl=24*60*60, show_spinner=False)
+def decompose_store(item_id):
+    return seasonal_decompose(ts_df.loc[item_id]["target"], period=52)
+
+# MAPE calculé directement avec NumPy (même formule que scikit-learn, sans la validation des entrées)
+def mean_absolute_percentage_error(actuals, forecast):
+    return np.mean(np.abs(actuals - forecast) / np.maximum(np.abs(actuals), np.finfo(np.float64).eps))
+
+# MAPE par magasin (calculé une seule fois, les données étant statiques)
+@st.cache_resource(show_spinner=False)
+def compute_mape_table(_ts_df, _predictions):
+    # Seuls les magasins présents dans les deux sources ont un MAPE
+    return {
+        item_id: mean_absolute_percentage_error(
+            _ts_df.loc[item_id]["target"][-40:].to_numpy(), _predictions[item_id]["mean"].to_numpy()
+        )
+        for item_id in _ts_df.item_ids.unique()
+        if item_id in _predictions
+    }
+
+mape_table = compute_mape_table(ts_df, all_predictions)
+
+# Graphique des prévisions (image PNG mise en cache par magasin)
+@st.cache_data(show_spinner=False)
+def render_forecast_png(item_id):
+    predictions = all_predictions[item_id]
+    observed = ts_df.loc[item_id]  # Une seule sélection du magasin, réutilisée ensuite
+    # Passer des tableaux NumPy à Matplotlib plutôt que des objets pandas
+    observed_dates = observed.index.to_numpy()
+    observed_target = observed["target"].to_numpy(copy=False)
+    forecast_dates = predictions["timestamp"].to_numpy()
+
+    # Tracer les prévisions
+    fig = Figure(figsize=(12, 6))  # Hors de pyplot : rien à fermer
+    ax = fig.subplots()
+
+    #Tracer les données observées
+    ax.plot(
+        observed_dates,  # Index pour les dates
+        observed_target, 
+        label="Observé"
+    )
+
+    # Tracer les prévisions
+    ax.plot(
+        forecast_dates, 
+        predictions["mean"].to_numpy(copy=False), 
+        label="Prévision", 
+        linestyle="--", 
+        color="orange"
+    )
+
+    # Ajouter l'intervalle de confiance
+    ax.fill_between(
+        forecast_dates,
+        predictions["0.1"].to_numpy(copy=False),
+        predictions["0.9"].to_numpy(copy=False),
+        color="orange",
+        alpha=0.2,
+        label="Intervalle de confiance"
+    )
+
+    # Ajuster les limites de l'axe x pour ne pas inclure 1970
+    start_date, end_date = observed_dates.min(), observed_dates.max()
+    ax.set_xlim([start_date, end_date])
+
+    # Ajouter des titres et une légende
+    ax.set_title(f"Prévisions pour le magasin {item_id}")
+    ax.legend()
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=FIGURE_DPI)
+    return buf.getvalue()
+
+# Graphique d'une composante de la décomposition (image PNG mise en cache)
+@st.cache_data(show_spinner=False)
+def render_component_png(item_id, component):
+    decomposed = decompose_store(item_id)
+
+    fig = Figure(figsize=(12, 6))  # Hors de pyplot : rien à fermer
+    ax = fig.subplots()
+    if component == "Tendance":
+        ax.plot(decomposed.trend, label="Tendance", color="green")
+    elif component == "Saisonnière":
+        ax.plot(decomposed.seasonal, label="Saisonnière", color="orange")
+    elif component == "Résidus":
+        ax.plot(decomposed.resid, label="Résidus", color="red")
+
+    ax.set_title(f"Composante : {component}")
+    ax.legend()
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=FIGURE_DPI)
+    return buf.getvalue()
+
 # Titre de l'application
 st.title("Dashboard de prévisions des ventes")
 st.markdown("""
@@ -70,42 +154,6 @@ selected_item = st.selectbox("Sélectionnez un magasin :", item_ids)
 # Prévisions temporelles (Graphique interactif 1)
 st.header("Prévisions temporelles")
 st.markdown(f"Prévisions pour le magasin sélectionné : **{selected_item}**")
-predictions = all_predictions[all_predictions['item_id'] == selected_item]
-
-# Tracer les prévisions
-fig, ax = plt.subplots(figsize=(12, 6))
-
-#Tracer les données observées
-ax.plot(
-    ts_df.loc[selected_item].index,  # Index pour les dates
-    ts_df.loc[selected_item]["target"], 
-    label="Observé"
-)
-
-# Tracer les prévisions
-ax.plot(
-    pd.to_datetime(predictions["timestamp"]), 
-    predictions["mean"], 
-    label="Prévision", 
-    linestyle="--", 
-    color="orange"
-)
-
-# Ajouter l'intervalle de confiance
-ax.fill_between(
-    pd.to_datetime(predictions["timestamp"]),
-    predictions["0.1"],
-    predictions["0.9"],
-    color="orange",
-    alpha=0.2,
-    label="Intervalle de confiance"
-)
-
-# Ajuster les limites de l'axe x pour ne pas inclure 1970
-start_date = ts_df.loc[selected_item].index.min()
-end_date = ts_df.loc[selected_item].index.max()
-ax.set_xlim([start_date, end_date])
-
 st.write("Voici les valeurs prédites avec leurs intervalles de confiance.")
 
 with st.expander("ℹ️ Qu'est-ce qu'un intervalle de confiance ?"):
@@ -115,23 +163,14 @@ with st.expander("ℹ️ Qu'est-ce qu'un intervalle de confiance ?"):
         "Par exemple, un intervalle de confiance à 95 % signifie que si l'on répétait l'expérience plusieurs "
         "fois, la vraie valeur se situerait dans cet intervalle 95 % du temps."
     )
-    
-# Ajouter des titres et une légende
-ax.set_title(f"Prévisions pour le magasin {selected_item}")
-ax.legend()
-plt.tight_layout()
 
 # Afficher dans Streamlit
-st.pyplot(fig)
+st.image(render_forecast_png(selected_item), use_container_width=True)
 
 # Analyse de la saisonnalité (Graphique interactif 2)
 st.header("Analyse de la saisonnalité")
 st.markdown("Explorez les composantes : Tendance, Saisonnière ou Résidus.")
 
-# Décomposer les données
-selected_data = ts_df.loc[selected_item]["target"]
-decomposed = seasonal_decompose(selected_data, period=52)
-
 # Options pour les composantes
 component = st.selectbox(
     "Choisissez une composante à explorer :",
@@ -165,18 +204,7 @@ st.write(f"{ component_explanations[component]}")
 
 
 # Tracer la composante sélectionnée
-fig, ax = plt.subplots(figsize=(12, 6))
-if component == "Tendance":
-    ax.plot(decomposed.trend, label="Tendance", color="green")
-elif component == "Saisonnière":
-    ax.plot(decomposed.seasonal, label="Saisonnière", color="orange")
-elif component == "Résidus":
-    ax.plot(decomposed.resid, label="Résidus", color="red")
-
-ax.set_title(f"Composante : {component}")
-ax.legend()
-plt.tight_layout()
-st.pyplot(fig)
+st.image(render_component_png(selected_item, component), use_container_width=True)
 
 # Calcul du MAPE
 st.header("Performance des prévisions")
@@ -192,7 +220,5 @@ st.markdown(
     """
 )
 st.markdown("**MAPE (Mean Absolute Percentage Error)** pour évaluer la précision des prévisions.")
-actuals = ts_df.loc[selected_item]["target"][-40:]
-forecast = predictions["mean"]
-mape = mean_absolute_percentage_error(actuals, forecast)
+mape = mape_table.get(selected_item, np.nan)
 st.metric(label="MAPE (%)", value=f"{mape*100:.2f}")
\ No newline at end of file
@@ -0,0 +1,101 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+COVARIATES = ['IsHoliday', 'Super_Bowl', 'Labor_Day', 'Thanksgiving', 'Christmas']
+
+
+# Préparer les données (nettoyage + rééchantillonnage)
+def prepare_data(file_path="clean_data.csv"):
+    # Charger uniquement les colonnes nécessaires, avec leurs types
+    # (ventes en float64 pour la moyenne par magasin, converties en float32 en fin de préparation)
+    covariates = COVARIATES
+    df = pd.read_csv(
+        file_path,
+        usecols=['Store', 'Date', 'Weekly_Sales'] + covariates,
+        dtype={'Store': 'int32', 'Weekly_Sales': 'float64', **{col: 'bool' for col in covariates}},
+        parse_dates=['Date'],
+        engine='pyarrow',  # Lecteur CSV multithreadé de pyarrow
+    )
+
+    # Renommer les colonnes nécessaires (avec covariates)
+    df = df.rename(columns={'Store': 'item_id', 'Date': 'timestamp', 'Weekly_Sales': 'target'})
+    df = df[['item_id', 'timestamp', 'target'] + covariates].dropna()
+
+    # Trier les données
+    df = df.sort_values(by=['item_id', 'timestamp']).reset_index(drop=True)
+
+    # Éliminer les doublons dans `timestamp` par `item_id`
+    df = df.groupby(['item_id', 'timestamp'], as_index=False).mean()
+
+    # Rééchantillonnage (fréquence hebdomadaire) dans un tableau préalloué
+    freq = 'W'
+    value_columns = ['target'] + covariates
+    full_idx = pd.date_range(df['timestamp'].min(), df['timestamp'].max(), freq=freq).to_numpy()
+    item_ids = df['item_id'].unique()
+    n_dates = len(full_idx)
+
+    timestamps = df['timestamp'].to_numpy()
+    # Les blocs pandas sont stockés transposés : `to_numpy` renvoie un tableau en ordre Fortran,
+    # on le recopie en ordre C car la boucle ci-dessous lit des lignes entières
+    values = np.ascontiguousarray(df[value_columns].to_numpy(dtype='float64'))
+    bounds = np.append(np.searchsorted(df['item_id'].to_numpy(), item_ids), len(df))
+
+    out = np.empty((len(item_ids) * n_dates, len(value_columns)), dtype='float64')
+    keep = np.empty(len(item_ids) * n_dates, dtype=bool)
+    for i in range(len(item_ids)):
+        start, stop = bounds[i], bounds[i + 1]
+        item_timestamps = timestamps[start:stop]
+        rows = slice(i * n_dates, (i + 1) * n_dates)
+
+        # Dernière observation connue à chaque date (équivalent de `asfreq(freq, method='pad')`)
+        pos = np.searchsorted(item_timestamps, full_idx, side='right') - 1
+        out[rows] = values[start + np.maximum(pos, 0)]
+        keep[rows] = (pos >= 0) & (full_idx <= item_timestamps[-1])  # Rester dans la période du magasin
+
+    df_regular = pd.DataFrame(out, columns=value_columns)
+    df_regular.insert(0, 'timestamp', np.tile(full_idx, len(item_ids)))
+    df_regular.insert(0, 'item_id', np.repeat(item_ids, n_dates))
+    df_regular = df_regular[keep].reset_index(drop=True)
+
+    # Réduire la taille des types numériques
+    df_regular[covariates] = df_regular[covariates].astype('int8')
+    df_regular['target'] = df_regular['target'].astype('float32')
+
+    return df_regular
+
+
+# Le cache est périmé s'il manque ou s'il est plus ancien que le CSV ou que ce script
+def cache_is_stale(csv_path="clean_data.csv", parquet_path="clean_data.parquet"):
+    if not os.path.exists(parquet_path):
+        return True
+    parquet_mtime = os.path.getmtime(parquet_path)
+    # Sans CSV (non livré), un cache existant reste utilisable
+    csv_is_newer = os.path.exists(csv_path) and os.path.getmtime(csv_path) > parquet_mtime
+    return csv_is_newer or os.path.getmtime(__file__) > parquet_mtime
+
+
+# Sauvegarder les données préparées au format Parquet
+def write_cache(csv_path="clean_data.csv", parquet_path="clean_data.parquet"):
+    df_regular = prepare_data(csv_path)
+
+    # Écrire dans un fichier temporaire puis le renommer : un cache tronqué n'est jamais visible
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(parquet_path)),
+        prefix=os.path.basename(parquet_path) + ".",
+        suffix=".tmp",
+    )
+    os.close(fd)
+    try:
+        df_regular.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, parquet_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return df_regular
+
+
+if __name__ == "__main__":
+    write_cache()